@@ -3,9 +3,12 @@ from __future__ import annotations
 import argparse
 import os
 import sys
+import threading
+import time
+from collections import OrderedDict
 from typing import cast
 
-from PySide6.QtCore import Qt, QSize, QTimer
+from PySide6.QtCore import QObject, QPoint, QRunnable, Qt, QSize, QThreadPool, QTimer, Signal
 from PySide6.QtGui import QAction, QImageReader, QKeySequence, QPixmap, QUndoCommand, QUndoStack
 from PySide6.QtWidgets import (
     QApplication,
@@ -30,7 +33,13 @@ from PySide6.QtWidgets import QAbstractItemView
 from .fs_scan import scan_folder_for_images
 from .image_model import ImageListModel
 from .order_store import load_order, save_order
-from .rename_commit import build_rename_plan, find_collisions, execute_rename_plan
+from .rename_commit import (
+    RenameCancelled,
+    RenamePlan,
+    build_rename_plan,
+    execute_rename_plan,
+    find_collisions,
+)
 
 
 def _build_initial_order(folder: str, scanned: list[str]) -> list[str]:
@@ -45,6 +54,9 @@ def _build_initial_order(folder: str, scanned: list[str]) -> list[str]:
             ordered.append(f)
             scanned_set.remove(f)
 
+    if not scanned_set:
+        return ordered
+
     # append new files (not seen before) in name order
     ordered.extend(sorted(scanned_set))
     return ordered
@@ -70,6 +82,38 @@ class _ReorderCommand(QUndoCommand):
         self._w._apply_order(self._after, record_undo=False)
 
 
+class _RenameWorker(QObject):
+    progress = Signal(int, int)  # done, total
+    finished = Signal(object)  # exception, or None on success
+
+
+class _RenameTask(QRunnable):
+    """Runs execute_rename_plan off the GUI thread, reporting via _RenameWorker."""
+
+    def __init__(self, plan: RenamePlan, worker: _RenameWorker, cancel_event: threading.Event):
+        super().__init__()
+        self.plan = plan
+        self.worker = worker
+        self.cancel_event = cancel_event
+        self._last_progress = 0.0
+
+    def _progress(self, done: int, total: int) -> None:
+        # Don't flood the GUI thread's queue; ~30 updates a second is plenty.
+        now = time.monotonic()
+        if done != total and now - self._last_progress < 0.033:
+            return
+        self._last_progress = now
+        self.worker.progress.emit(done, total)
+
+    def run(self) -> None:
+        try:
+            execute_rename_plan(self.plan, progress_cb=self._progress, cancel_event=self.cancel_event)
+        except Exception as e:
+            self.worker.finished.emit(e)
+            return
+        self.worker.finished.emit(None)
+
+
 class _AutoScrollListView(QListView):
     """
     QListView internal move doesn't always auto-scroll reliably in IconMode when
@@ -113,6 +157,11 @@ class MainWindow(QMainWindow):
         self._suppress_autosave = False
         self._record_undo = True
 
+        # set while a rename runs in the background
+        self._rename_worker: _RenameWorker | None = None
+        self._rename_cancel: threading.Event | None = None
+        self._rename_progress: QProgressDialog | None = None
+
         self.undo_stack = QUndoStack(self)
 
         self.model = ImageListModel()
@@ -121,25 +170,39 @@ class MainWindow(QMainWindow):
 
         self._make_ui()
 
+        # recently shown previews, so flipping back and forth skips the decode
+        self._preview_cache: OrderedDict[tuple[str, int, int], QPixmap] = OrderedDict()
+        self._preview_cache_limit = 16
+
         # debounce preview refresh during resize
         self._preview_timer = QTimer(self)
         self._preview_timer.setSingleShot(True)
         self._preview_timer.timeout.connect(self._refresh_preview)
 
+        # coalesce order-file writes during bursts of drag/drop or undo/redo
+        self._order_dirty = False
+        self._save_timer = QTimer(self)
+        self._save_timer.setSingleShot(True)
+        self._save_timer.setInterval(500)
+        self._save_timer.timeout.connect(self._flush_order)
+
     # --- UI ---
     def _make_ui(self) -> None:
         tb = QToolBar("Main")
         tb.setMovable(False)
         self.addToolBar(tb)
+        self._toolbar = tb
 
         # Undo/Redo
         act_undo = self.undo_stack.createUndoAction(self, "Undo")
         act_undo.setShortcuts([QKeySequence.StandardKey.Undo])
+        self._act_undo = act_undo
         tb.addAction(act_undo)
         self.addAction(act_undo)  # ensure shortcuts work
 
         act_redo = self.undo_stack.createRedoAction(self, "Redo")
         act_redo.setShortcuts([QKeySequence.StandardKey.Redo, QKeySequence("Ctrl+Y")])
+        self._act_redo = act_redo
         tb.addAction(act_redo)
         self.addAction(act_redo)
 
@@ -194,6 +257,18 @@ class MainWindow(QMainWindow):
         self.list_view.selectionModel().selectionChanged.connect(lambda *_: self._refresh_preview())
         left_layout.addWidget(self.list_view)
 
+        # Thumbnails are requested only for what's on screen (plus some overscan),
+        # debounced so fast scrolling doesn't flood the thread pool.
+        self._thumb_timer = QTimer(self)
+        self._thumb_timer.setSingleShot(True)
+        self._thumb_timer.setInterval(50)
+        self._thumb_timer.timeout.connect(self._request_visible_thumbs)
+        self.list_view.verticalScrollBar().valueChanged.connect(lambda *_: self._thumb_timer.start())
+        self.list_view.verticalScrollBar().rangeChanged.connect(lambda *_: self._thumb_timer.start())
+        self.model.modelReset.connect(self._thumb_timer.start)
+        self.model.rowsMoved.connect(lambda *_: self._thumb_timer.start())
+        self.model.layoutChanged.connect(lambda *_: self._thumb_timer.start())
+
         splitter.addWidget(left)
 
         # right: preview
@@ -232,10 +307,58 @@ class MainWindow(QMainWindow):
         icon = self.list_view.iconSize()
         self.list_view.setGridSize(QSize(icon.width() + 40, icon.height() + 50))
 
+    def _visible_row_range(self) -> tuple[int, int] | None:
+        """First/last row currently shown in the list viewport (inclusive)."""
+        count = self.model.rowCount()
+        if count == 0:
+            return None
+        rect = self.list_view.viewport().rect()
+        # Nudge inwards so the probe lands on an item rather than the spacing.
+        inset = self.list_view.spacing() + 1
+        first = self.list_view.indexAt(rect.topLeft() + QPoint(inset, inset))
+        last = self.list_view.indexAt(rect.bottomRight() - QPoint(inset, inset))
+        first_row = first.row() if first.isValid() else 0
+        if last.isValid():
+            last_row = last.row()
+        else:
+            # Last line is partially filled (or empty area): walk back along
+            # the bottom edge, falling back to the end of the list.
+            last_row = count - 1
+            x = rect.right() - inset
+            while x > rect.left():
+                idx = self.list_view.indexAt(QPoint(x, rect.bottom() - inset))
+                if idx.isValid():
+                    last_row = idx.row()
+                    break
+                x -= max(1, self.list_view.gridSize().width() // 2)
+        return first_row, max(first_row, last_row)
+
+    def _request_visible_thumbs(self) -> None:
+        visible = self._visible_row_range()
+        if visible is None:
+            return
+        first, last = visible
+        # Overscan by about one screen in each direction; visible rows first.
+        screen = last - first + 1
+        rows = list(range(first, last + 1))
+        rows.extend(range(last + 1, min(self.model.rowCount(), last + 1 + screen)))
+        rows.extend(range(first - 1, max(-1, first - 1 - screen), -1))
+        self.model.request_thumbs_for_rows(rows)
+
     # --- events ---
     def resizeEvent(self, event) -> None:  # noqa: N802
         super().resizeEvent(event)
         self._preview_timer.start(120)
+        self._thumb_timer.start()
+
+    def closeEvent(self, event) -> None:  # noqa: N802
+        if self._rename_worker is not None:
+            # Quitting mid-rename would leave files under temporary names.
+            self.statusBar().showMessage("Rename in progress; wait for it to finish or cancel it")
+            event.ignore()
+            return
+        self._flush_order()
+        super().closeEvent(event)
 
     # --- actions ---
     def select_folder(self) -> None:
@@ -246,11 +369,16 @@ class MainWindow(QMainWindow):
         self.load_folder(folder)
 
     def load_folder(self, folder: str) -> None:
+        # Don't lose a pending save for the folder we're leaving.
+        self._flush_order()
+
         if not os.path.isdir(folder):
             QMessageBox.warning(self, "Invalid folder", "That folder does not exist.")
             return
 
         self.undo_stack.clear()
+        # Filenames may now refer to different files (e.g. after a rename).
+        self._preview_cache.clear()
 
         scan = scan_folder_for_images(folder)
         ordered = _build_initial_order(folder, scan.image_files)
@@ -263,12 +391,16 @@ class MainWindow(QMainWindow):
             self.model.set_folder_and_files(folder, ordered)
             self.model.set_icon_size(self.list_view.iconSize())
             self._sync_thumbnail_grid_metrics()
+            # Start decoding the first couple of screens right away instead of
+            # waiting for the viewport to ask for them.
+            self.model.request_thumbs_for_rows(range(0, min(len(ordered), 200)), prefetch=True)
         finally:
             self._suppress_autosave = False
             self._record_undo = True
 
         # persist immediately so new files get recorded too
-        save_order(folder, self.model.files())
+        self._order_dirty = True
+        self._flush_order()
         self.statusBar().showMessage(f"Loaded {len(ordered)} images")
 
         # After large renames + model reset, force a layout pass so icon rects
@@ -297,7 +429,7 @@ class MainWindow(QMainWindow):
             self._record_undo = True
 
         # Save order file for undo/redo too.
-        save_order(folder, self.model.files())
+        self._schedule_save()
 
         if selected:
             try:
@@ -314,6 +446,19 @@ class MainWindow(QMainWindow):
         folder = self._folder
         if not folder:
             return
+        self._schedule_save()
+
+    def _schedule_save(self) -> None:
+        self._order_dirty = True
+        self._save_timer.start()
+
+    def _flush_order(self) -> None:
+        """Write the order file now if there are unsaved changes."""
+        self._save_timer.stop()
+        folder = self._folder
+        if not self._order_dirty or not folder:
+            return
+        self._order_dirty = False
         save_order(folder, self.model.files())
         self.statusBar().showMessage("Order saved")
 
@@ -358,6 +503,14 @@ class MainWindow(QMainWindow):
         if target.width() <= 10 or target.height() <= 10:
             return
 
+        key = (filename, target.width(), target.height())
+        cached = self._preview_cache.get(key)
+        if cached is not None:
+            self._preview_cache.move_to_end(key)
+            self.preview_label.setPixmap(cached)
+            self.preview_label.setText("")
+            return
+
         reader = QImageReader(path)
         reader.setAutoTransform(True)
         # Read scaled-to-fit to save memory/time on large originals.
@@ -381,6 +534,9 @@ class MainWindow(QMainWindow):
                 Qt.AspectRatioMode.KeepAspectRatio,
                 Qt.TransformationMode.SmoothTransformation,
             )
+        self._preview_cache[key] = pix
+        while len(self._preview_cache) > self._preview_cache_limit:
+            self._preview_cache.popitem(last=False)
         self.preview_label.setPixmap(pix)
         self.preview_label.setText("")
 
@@ -390,6 +546,8 @@ class MainWindow(QMainWindow):
             QMessageBox.information(self, "No folder selected", "Select a folder first.")
             return
 
+        self._flush_order()
+
         ordered = self.model.files()
         if not ordered:
             QMessageBox.information(self, "No images", "No images found in this folder.")
@@ -424,23 +582,71 @@ class MainWindow(QMainWindow):
         if resp != QMessageBox.StandardButton.Yes:
             return
 
-        prog = QProgressDialog("Renaming files…", None, 0, len(plan.old_to_new) * 2, self)
-        prog.setWindowModality(Qt.WindowModality.ApplicationModal)
+        prog = QProgressDialog("Renaming files…", "Cancel", 0, len(plan.old_to_new) * 2, self)
+        prog.setWindowModality(Qt.WindowModality.NonModal)
         prog.setMinimumDuration(0)
+        prog.setAutoClose(False)
+        prog.setAutoReset(False)
+
+        cancel = threading.Event()
+        prog.canceled.connect(self._on_rename_cancel_requested)
+
+        worker = _RenameWorker()
+        worker.progress.connect(self._on_rename_progress, Qt.ConnectionType.QueuedConnection)
+        worker.finished.connect(self._on_rename_finished, Qt.ConnectionType.QueuedConnection)
+
+        self._rename_worker = worker
+        self._rename_cancel = cancel
+        self._rename_progress = prog
+        self._set_rename_busy(True)
+        prog.show()
+        QThreadPool.globalInstance().start(_RenameTask(plan, worker, cancel))
+
+    def _set_rename_busy(self, busy: bool) -> None:
+        # Block edits while files are being renamed underneath the model.
+        self._toolbar.setEnabled(not busy)
+        self.list_view.setEnabled(not busy)
+        self._act_undo.setEnabled(not busy and self.undo_stack.canUndo())
+        self._act_redo.setEnabled(not busy and self.undo_stack.canRedo())
+
+    def _on_rename_cancel_requested(self) -> None:
+        # Closing the dialog also emits canceled; ignore it once the rename is over.
+        if self._rename_cancel is None:
+            return
+        self._rename_cancel.set()
+        self.statusBar().showMessage("Cancelling rename…")
 
-        def progress(done: int, total: int) -> None:
-            prog.setMaximum(total)
-            prog.setValue(done)
-            QApplication.processEvents()
+    def _on_rename_progress(self, done: int, total: int) -> None:
+        prog = self._rename_progress
+        if prog is None:
+            return
+        prog.setMaximum(total)
+        prog.setValue(done)
 
-        try:
-            execute_rename_plan(plan, progress_cb=progress)
-        except Exception as e:
-            QMessageBox.critical(self, "Rename failed", f"Rename failed:\n{e}")
+    def _on_rename_finished(self, error: Exception | None) -> None:
+        folder = self._folder
+        prog = self._rename_progress
+        self._rename_worker = None
+        self._rename_cancel = None
+        self._rename_progress = None
+        if prog is not None:
+            prog.canceled.disconnect(self._on_rename_cancel_requested)
+            prog.close()
+            prog.deleteLater()
+        self._set_rename_busy(False)
+
+        if isinstance(error, RenameCancelled):
+            self.statusBar().showMessage("Rename cancelled; no files were changed")
+            return
+        if error is not None:
+            QMessageBox.critical(self, "Rename failed", f"Rename failed:\n{error}")
             return
 
         # reload folder to reflect new names + update order file
-        self.load_folder(folder)
+        if folder:
+            self.load_folder(folder)
+            # Thumbnails cached under the old names are unreachable now.
+            self.model.prune_disk_thumbs()
         self.statusBar().showMessage("Rename complete")
 
 
@@ -1,6 +1,11 @@
 from __future__ import annotations
 
-ORDER_FILENAME = ".photo-sorter-order.json"
+ORDER_FILENAME = ".photo-sorter-order"
+# Older versions stored the order as JSON; still read if present.
+LEGACY_ORDER_FILENAME = ".photo-sorter-order.json"
+
+# Per-folder on-disk thumbnail cache (safe to delete; regenerated on demand).
+THUMB_DIRNAME = ".photo-sorter-thumbs"
 
 # Keep to "basic formats" + a couple common ones; non-images are ignored.
 IMAGE_EXTS = {
@@ -1,10 +1,19 @@
 from __future__ import annotations
 
 import os
+from concurrent.futures import ThreadPoolExecutor
 from dataclasses import dataclass
 
 from .constants import IMAGE_EXTS
 
+# str.endswith accepts a tuple; IMAGE_EXTS is already lowercase.
+_EXT_TUPLE = tuple(IMAGE_EXTS)
+
+# Above this many candidates the is_file() checks are spread over a few
+# threads. On local disks they are answered from the dirent cache anyway, but
+# on NAS/SSHFS each one may be a round trip, so overlapping them hides latency.
+_PARALLEL_SCAN_MIN_ENTRIES = 1000
+
 
 @dataclass(frozen=True)
 class FolderScan:
@@ -12,15 +21,23 @@ class FolderScan:
     image_files: list[str]  # basenames only
 
 
+def _filter_files(entries: list[os.DirEntry]) -> list[str]:
+    return [de.name for de in entries if de.is_file()]
+
+
 def scan_folder_for_images(folder: str) -> FolderScan:
-    entries: list[str] = []
     with os.scandir(folder) as it:
-        for de in it:
-            if not de.is_file():
-                continue
-            _, ext = os.path.splitext(de.name)
-            if ext.lower() in IMAGE_EXTS:
-                entries.append(de.name)
-    return FolderScan(folder=folder, image_files=entries)
+        # Cheap name check first; is_file() may need a stat().
+        candidates = [de for de in it if de.name.lower().endswith(_EXT_TUPLE)]
 
+    if len(candidates) <= _PARALLEL_SCAN_MIN_ENTRIES:
+        return FolderScan(folder=folder, image_files=_filter_files(candidates))
 
+    workers = min(8, os.cpu_count() or 4)
+    shard = -(-len(candidates) // workers)
+    shards = [candidates[i : i + shard] for i in range(0, len(candidates), shard)]
+    entries: list[str] = []
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        for names in pool.map(_filter_files, shards):
+            entries.extend(names)
+    return FolderScan(folder=folder, image_files=entries)
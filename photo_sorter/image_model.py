@@ -1,8 +1,11 @@
 from __future__ import annotations
 
+import hashlib
 import os
-from collections import OrderedDict
+import threading
+from collections import deque
 from dataclasses import dataclass
+from typing import Iterable
 
 from PySide6.QtCore import (
     QAbstractListModel,
@@ -16,7 +19,19 @@ from PySide6.QtCore import (
     Signal,
     QSize,
 )
-from PySide6.QtGui import QIcon, QImageReader, QPixmap
+from PySide6.QtGui import QIcon, QImage, QImageReader, QPixmap, QPixmapCache
+
+from .constants import THUMB_DIRNAME
+
+
+_HANDLED_ROLES = frozenset(
+    {
+        Qt.ItemDataRole.DisplayRole,
+        Qt.ItemDataRole.DecorationRole,
+        Qt.ItemDataRole.SizeHintRole,
+        Qt.ItemDataRole.ToolTipRole,
+    }
+)
 
 
 @dataclass(frozen=True)
@@ -25,34 +40,158 @@ class ImageEntry:
 
 
 class _ThumbResult(QObject):
-    ready = Signal(str, QPixmap)  # filename, pixmap
+    ready = Signal(str, QPixmap, int)  # filename, pixmap, generation
+    failed = Signal(str, int)  # filename, generation
+
+    def __init__(self) -> None:
+        super().__init__()
+        # Bumped by the model on every reset; tasks from an older generation
+        # bail out. Plain int reads/writes are atomic under the GIL.
+        self._current_gen = 0
+
+
+# Opaque thumbnails are stored as JPEG, ones with transparency as PNG (JPEG
+# has no alpha channel and would flatten them onto black).
+_DISK_THUMB_EXTS = (".jpg", ".png")
+
+
+def _disk_thumb_base(folder: str, filename: str, mtime_ns: int, size: QSize) -> str:
+    """Cache path for a thumbnail, without extension (see _DISK_THUMB_EXTS)."""
+    key = hashlib.blake2b(
+        f"{filename}|{mtime_ns}|{size.width()}x{size.height()}".encode("utf-8"),
+        digest_size=16,
+    ).hexdigest()
+    return os.path.join(folder, THUMB_DIRNAME, key[:2], key)
+
+
+def _save_disk_thumb(base: str, img: QImage) -> None:
+    # Best effort: a read-only folder just means no persistent cache.
+    if img.hasAlphaChannel():
+        path, fmt, quality = base + ".png", "PNG", -1
+    else:
+        path, fmt, quality = base + ".jpg", "JPEG", 85
+    tmp_path = f"{path}.{threading.get_ident()}.tmp"
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        if img.save(tmp_path, fmt, quality):
+            os.replace(tmp_path, path)
+        elif os.path.exists(tmp_path):
+            os.remove(tmp_path)
+    except OSError:
+        pass
+
+
+def prune_disk_thumbs(folder: str, keep_files: Iterable[str], size: QSize) -> int:
+    """
+    Delete cached thumbnails in `folder` that don't belong to `keep_files` at
+    `size` (e.g. left behind by a rename). Returns how many were removed.
+    """
+    root = os.path.join(folder, THUMB_DIRNAME)
+    if not os.path.isdir(root):
+        return 0
+    keep: set[str] = set()
+    for filename in keep_files:
+        try:
+            st = os.stat(os.path.join(folder, filename))
+        except OSError:
+            continue
+        keep.add(os.path.basename(_disk_thumb_base(folder, filename, st.st_mtime_ns, size)))
+
+    removed = 0
+    try:
+        with os.scandir(root) as shards:
+            shard_paths = [de.path for de in shards if de.is_dir(follow_symlinks=False)]
+    except OSError:
+        return 0
+    for shard in shard_paths:
+        try:
+            with os.scandir(shard) as it:
+                entries = [(de.name, de.path) for de in it]
+        except OSError:
+            continue
+        for name, path in entries:
+            stem, ext = os.path.splitext(name)
+            # Leave in-flight "*.tmp" writes alone.
+            if ext not in _DISK_THUMB_EXTS or stem in keep:
+                continue
+            try:
+                os.remove(path)
+                removed += 1
+            except OSError:
+                pass
+        try:
+            os.rmdir(shard)  # only succeeds once empty
+        except OSError:
+            pass
+    return removed
+
+
+class _PruneTask(QRunnable):
+    def __init__(self, folder: str, keep_files: list[str], size: QSize):
+        super().__init__()
+        self.folder = folder
+        self.keep_files = keep_files
+        self.size = size
+
+    def run(self) -> None:
+        prune_disk_thumbs(self.folder, self.keep_files, self.size)
 
 
 class _ThumbTask(QRunnable):
-    def __init__(self, folder: str, filename: str, size: QSize, sink: _ThumbResult):
+    def __init__(self, folder: str, filename: str, size: QSize, sink: _ThumbResult, gen: int):
         super().__init__()
         self.folder = folder
         self.filename = filename
         self.size = size
         self.sink = sink
+        self.gen = gen
+
+    def _stale(self) -> bool:
+        return self.sink._current_gen != self.gen
 
     def run(self) -> None:
+        if self._stale():
+            return
         path = os.path.join(self.folder, self.filename)
+        sized = self.size.width() > 0 and self.size.height() > 0
+        cache_base: str | None = None
+        if sized:
+            try:
+                st = os.stat(path)
+            except OSError:
+                self.sink.failed.emit(self.filename, self.gen)
+                return
+            cache_base = _disk_thumb_base(self.folder, self.filename, st.st_mtime_ns, self.size)
+            for ext in _DISK_THUMB_EXTS:
+                if not os.path.exists(cache_base + ext):
+                    continue
+                img = QImage(cache_base + ext)
+                if not img.isNull():
+                    if not self._stale():
+                        self.sink.ready.emit(self.filename, QPixmap.fromImage(img), self.gen)
+                    return
+
         reader = QImageReader(path)
         reader.setAutoTransform(True)
-        if self.size.width() > 0 and self.size.height() > 0:
+        if sized:
             reader.setScaledSize(self.size)
         img = reader.read()
+        if self._stale():
+            return
         if img.isNull():
+            self.sink.failed.emit(self.filename, self.gen)
             return
-        pix = QPixmap.fromImage(img)
-        if self.size.width() > 0 and self.size.height() > 0:
-            pix = pix.scaled(
+        if sized:
+            img = img.scaled(
                 self.size,
                 Qt.AspectRatioMode.KeepAspectRatio,
                 Qt.TransformationMode.SmoothTransformation,
             )
-        self.sink.ready.emit(self.filename, pix)
+        if cache_base is not None:
+            _save_disk_thumb(cache_base, img)
+        if self._stale():
+            return
+        self.sink.ready.emit(self.filename, QPixmap.fromImage(img), self.gen)
 
 
 class ImageListModel(QAbstractListModel):
@@ -65,16 +204,34 @@ class ImageListModel(QAbstractListModel):
         super().__init__()
         self._folder: str | None = None
         self._files: list[str] = []
+        self._row_of: dict[str, int] = {}  # filename -> row, kept in sync with _files
 
         self._icon_size = QSize(160, 160)
         self._pool = QThreadPool.globalInstance()
         self._thumb_sink = _ThumbResult()
         self._thumb_sink.ready.connect(self._on_thumb_ready)
-        self._thumb_cache: OrderedDict[str, QPixmap] = OrderedDict()
-        self._thumb_cache_limit = 600
+        self._thumb_sink.failed.connect(self._on_thumb_failed)
+        # Thumbnails live in Qt's global QPixmapCache, keyed per filename and
+        # icon size so a previous size stays usable as a placeholder until the
+        # new one has rendered. `_thumb_epoch` namespaces the keys per folder.
+        QPixmapCache.setCacheLimit(200 * 1024)  # KB
+        self._thumb_epoch = 0
+        self._thumb_sizes: set[tuple[int, int]] = set()  # sizes inserted this epoch
+        # Thumbnails are only rendered for rows the view asks for (see
+        # request_thumbs_for_rows). `_thumb_queue` holds the wanted-but-not-yet-
+        # dispatched filenames; `_thumb_pending` the ones running in the pool.
+        self._thumb_queue: deque[str] = deque()
+        # Low-priority work (e.g. the first screens right after loading); only
+        # drained once `_thumb_queue` is empty and not replaced by scrolling.
+        self._thumb_prefetch: deque[str] = deque()
+        self._thumb_last_rows: list[int] = []  # last viewport request, replayed on resize
         self._thumb_pending: set[str] = set()
+        self._thumb_failed: set[str] = set()
+        self._thumb_max_in_flight = max(2, self._pool.maxThreadCount() * 2)
+        self._gen = 0
 
-        self._placeholder = QIcon()
+        self._placeholder = self._make_placeholder()
+        self._size_hint = self._make_size_hint()
 
     def folder(self) -> str | None:
         return self._folder
@@ -83,28 +240,53 @@ class ImageListModel(QAbstractListModel):
         return list(self._files)
 
     def set_icon_size(self, size: QSize) -> None:
-        self._icon_size = size
-        self._thumb_cache.clear()
-        self._thumb_pending.clear()
+        if size == self._icon_size:
+            return
+        self._icon_size = QSize(size)
+        self._placeholder = self._make_placeholder()
+        self._size_hint = self._make_size_hint()
+        # Keep the cache (it's size-keyed); just abandon work for the old size.
+        self._reset_thumbs(keep_cache=True)
         if self.rowCount() > 0:
             top_left = self.index(0, 0)
             bottom_right = self.index(self.rowCount() - 1, 0)
             self.dataChanged.emit(top_left, bottom_right, [Qt.ItemDataRole.DecorationRole])
+        # Stale-size thumbnails are shown meanwhile; render the visible rows
+        # at the new size without waiting for the next scroll.
+        self.request_thumbs_for_rows(self._thumb_last_rows)
+
+    def _make_placeholder(self) -> QIcon:
+        # One shared, full-size icon for every row still waiting on its
+        # thumbnail, so items never lay out around an empty icon.
+        pm = QPixmap(self._icon_size)
+        pm.fill(Qt.GlobalColor.darkGray)
+        return QIcon(pm)
+
+    def _make_size_hint(self) -> QSize:
+        # Ensure a stable item rect even before thumbnails are ready.
+        # Without this, Qt may compute a tiny height from an "empty" icon,
+        # and then the real thumbnail gets clipped into horizontal strips.
+        # Every row shares it (uniform item sizes).
+        return QSize(self._icon_size.width() + 40, self._icon_size.height() + 50)
 
     def set_folder_and_files(self, folder: str, files_in_order: list[str]) -> None:
         self.beginResetModel()
         self._folder = folder
         self._files = list(files_in_order)
-        self._thumb_cache.clear()
-        self._thumb_pending.clear()
+        self._rebuild_row_index()
+        self._reset_thumbs()
         self.endResetModel()
 
     def set_files_in_order(self, files_in_order: list[str]) -> None:
         """Replace the current order (folder remains unchanged)."""
         self.beginResetModel()
         self._files = list(files_in_order)
+        self._rebuild_row_index()
         self.endResetModel()
 
+    def _rebuild_row_index(self) -> None:
+        self._row_of = {f: i for i, f in enumerate(self._files)}
+
     # --- Qt model ---
     def rowCount(self, parent: QModelIndex = QModelIndex()) -> int:  # noqa: N802
         if parent.isValid():
@@ -112,6 +294,9 @@ class ImageListModel(QAbstractListModel):
         return len(self._files)
 
     def data(self, index: QModelIndex, role: int = Qt.ItemDataRole.DisplayRole):
+        # Views query many roles per paint; bail out before touching the index.
+        if role not in _HANDLED_ROLES:
+            return None
         if not index.isValid():
             return None
         row = index.row()
@@ -123,18 +308,22 @@ class ImageListModel(QAbstractListModel):
             return filename
 
         if role == Qt.ItemDataRole.SizeHintRole:
-            # Ensure a stable item rect even before thumbnails are ready.
-            # Without this, Qt may compute a tiny height from an "empty" icon,
-            # and then the real thumbnail gets clipped into horizontal strips.
-            return QSize(self._icon_size.width() + 40, self._icon_size.height() + 50)
+            return self._size_hint
 
         if role == Qt.ItemDataRole.DecorationRole:
-            pix = self._thumb_cache.get(filename)
+            pix = QPixmapCache.find(self._cache_key(filename))
             if pix is not None:
-                # refresh LRU
-                self._thumb_cache.move_to_end(filename)
                 return QIcon(pix)
-            self._schedule_thumb(filename)
+            stale = self._stale_thumb(filename)
+            if stale is not None:
+                return QIcon(
+                    stale.scaled(
+                        self._icon_size,
+                        Qt.AspectRatioMode.KeepAspectRatio,
+                        Qt.TransformationMode.FastTransformation,
+                    )
+                )
+            # Misses are filled in by request_thumbs_for_rows (viewport driven).
             return self._placeholder
 
         if role == Qt.ItemDataRole.ToolTipRole:
@@ -194,50 +383,150 @@ class ImageListModel(QAbstractListModel):
 
         row = max(0, min(row, self.rowCount()))
 
-        # Compute target row after removing sources before it.
-        adjust = sum(1 for r in src_rows if r < row)
-        target_row = row - adjust
-
-        # Extract + reinsert.
-        moving = [self._files[r] for r in src_rows if 0 <= r < len(self._files)]
-        if not moving:
+        src_rows = [r for r in src_rows if 0 <= r < len(self._files)]
+        if not src_rows:
             return False
 
-        old_order = list(self._files)
-        self.beginResetModel()
-        for r in reversed(src_rows):
-            if 0 <= r < len(self._files):
-                del self._files[r]
-        for i, f in enumerate(moving):
-            self._files.insert(target_row + i, f)
-        self.endResetModel()
+        # Moved rows end up, in their original order, at the drop position
+        # counted among the rows that stay. One O(N) rebuild regardless of
+        # how many rows move.
+        old_order = self._files
+        moving = [old_order[r] for r in src_rows]
+        moving_set = set(moving)
+        remaining = [f for f in old_order if f not in moving_set]
+        target_row = row - sum(1 for r in src_rows if r < row)
+        new_files = remaining[:target_row] + moving + remaining[target_row:]
+
+        parent_idx = QModelIndex()
+        start, end = src_rows[0], src_rows[-1]
+        if end - start + 1 == len(src_rows):
+            # A single contiguous block: a plain row move. Qt refuses (returns
+            # False) when the block would land where it already is.
+            if self.beginMoveRows(parent_idx, start, end, parent_idx, row):
+                self._files = new_files
+                self.endMoveRows()
+        else:
+            # Scattered selection: one layout change with remapped persistent
+            # indexes instead of a move per run.
+            self.layoutAboutToBeChanged.emit()
+            new_row_of = {f: i for i, f in enumerate(new_files)}
+            old_persistent = self.persistentIndexList()
+            new_persistent = [
+                self.index(new_row_of[old_order[i.row()]], 0) if i.isValid() else QModelIndex()
+                for i in old_persistent
+            ]
+            self._files = new_files
+            self.changePersistentIndexList(old_persistent, new_persistent)
+            self.layoutChanged.emit()
+        self._rebuild_row_index()
         new_order = list(self._files)
         self.orderChanged.emit()
         self.orderChangedDetailed.emit(old_order, new_order)
         return True
 
     # --- thumbs ---
-    def _schedule_thumb(self, filename: str) -> None:
+    def prune_disk_thumbs(self) -> None:
+        """Drop on-disk thumbnails of files no longer in the folder (runs in the pool)."""
+        if self._folder is None:
+            return
+        self._pool.start(_PruneTask(self._folder, list(self._files), QSize(self._icon_size)))
+
+    def request_thumbs_for_rows(self, rows: Iterable[int], *, prefetch: bool = False) -> None:
+        """
+        Queue thumbnails for `rows` (in priority order), replacing any earlier
+        request. Rows scrolled out of view are dropped before they hit the pool.
+
+        With `prefetch=True` the rows go to a background queue instead, which
+        later viewport requests don't replace and always take priority over.
+        """
+        if self._folder is None:
+            return
+        rows = list(rows)
+        if not prefetch:
+            self._thumb_last_rows = rows
+        queue: deque[str] = deque()
+        seen: set[str] = set()
+        n = len(self._files)
+        for row in rows:
+            if row < 0 or row >= n:
+                continue
+            filename = self._files[row]
+            if (
+                filename in seen
+                or QPixmapCache.find(self._cache_key(filename)) is not None
+                or filename in self._thumb_pending
+                or filename in self._thumb_failed
+            ):
+                continue
+            seen.add(filename)
+            queue.append(filename)
+        if prefetch:
+            self._thumb_prefetch = queue
+        else:
+            self._thumb_queue = queue
+        self._dispatch_thumbs()
+
+    def _dispatch_thumbs(self) -> None:
         if self._folder is None:
             return
-        if filename in self._thumb_pending:
+        while len(self._thumb_pending) < self._thumb_max_in_flight:
+            if self._thumb_queue:
+                filename = self._thumb_queue.popleft()
+            elif self._thumb_prefetch:
+                filename = self._thumb_prefetch.popleft()
+            else:
+                break
+            if filename in self._thumb_pending or QPixmapCache.find(self._cache_key(filename)) is not None:
+                continue
+            self._thumb_pending.add(filename)
+            task = _ThumbTask(self._folder, filename, self._icon_size, self._thumb_sink, self._gen)
+            self._pool.start(task)
+
+    def _cache_key(self, filename: str, size: QSize | None = None) -> str:
+        size = self._icon_size if size is None else size
+        return f"photo-sorter|{id(self)}|{self._thumb_epoch}|{filename}|{size.width()}x{size.height()}"
+
+    def _stale_thumb(self, filename: str) -> QPixmap | None:
+        """A cached thumbnail of `filename` at some other icon size, if any."""
+        for w, h in self._thumb_sizes:
+            pix = QPixmapCache.find(self._cache_key(filename, QSize(w, h)))
+            if pix is not None:
+                return pix
+        return None
+
+    def _reset_thumbs(self, *, keep_cache: bool = False) -> None:
+        # Invalidate everything already queued or running in the pool.
+        self._gen += 1
+        self._thumb_sink._current_gen = self._gen
+        if not keep_cache:
+            self._thumb_last_rows = []
+            # Entries of the previous folder become unreachable and age out
+            # of QPixmapCache on their own.
+            self._thumb_epoch += 1
+            self._thumb_sizes.clear()
+            self._thumb_failed.clear()
+        self._thumb_queue.clear()
+        self._thumb_prefetch.clear()
+        self._thumb_pending.clear()
+
+    def _on_thumb_failed(self, filename: str, gen: int) -> None:
+        if gen != self._gen:
             return
-        self._thumb_pending.add(filename)
-        task = _ThumbTask(self._folder, filename, self._icon_size, self._thumb_sink)
-        self._pool.start(task)
+        self._thumb_pending.discard(filename)
+        self._thumb_failed.add(filename)
+        self._dispatch_thumbs()
 
-    def _on_thumb_ready(self, filename: str, pixmap: QPixmap) -> None:
+    def _on_thumb_ready(self, filename: str, pixmap: QPixmap, gen: int) -> None:
+        # A reset may have happened while the result was queued to this thread.
+        if gen != self._gen:
+            return
         self._thumb_pending.discard(filename)
-        self._thumb_cache[filename] = pixmap
-        self._thumb_cache.move_to_end(filename)
-        while len(self._thumb_cache) > self._thumb_cache_limit:
-            self._thumb_cache.popitem(last=False)
+        QPixmapCache.insert(self._cache_key(filename), pixmap)
+        self._thumb_sizes.add((self._icon_size.width(), self._icon_size.height()))
+        self._dispatch_thumbs()
 
-        try:
-            row = self._files.index(filename)
-        except ValueError:
+        row = self._row_of.get(filename)
+        if row is None:
             return
         idx = self.index(row, 0)
         self.dataChanged.emit(idx, idx, [Qt.ItemDataRole.DecorationRole])
-
-
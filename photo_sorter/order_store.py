@@ -6,7 +6,9 @@ from dataclasses import dataclass
 from datetime import datetime, timezone
 from typing import Iterable
 
-from .constants import ORDER_FILENAME
+from .constants import LEGACY_ORDER_FILENAME, ORDER_FILENAME
+
+ORDER_HEADER = "#photo-sorter v1"
 
 
 @dataclass(frozen=True)
@@ -18,8 +20,8 @@ def order_file_path(folder: str) -> str:
     return os.path.join(folder, ORDER_FILENAME)
 
 
-def load_order(folder: str) -> StoredOrder | None:
-    path = order_file_path(folder)
+def _load_legacy_order(folder: str) -> StoredOrder | None:
+    path = os.path.join(folder, LEGACY_ORDER_FILENAME)
     if not os.path.exists(path):
         return None
     try:
@@ -33,17 +35,36 @@ def load_order(folder: str) -> StoredOrder | None:
         return None
 
 
+def load_order(folder: str) -> StoredOrder | None:
+    """
+    Order file format: one header line, then one basename per line.
+
+        #photo-sorter v1 <updated_at>
+        IMG_0001.jpg
+        ...
+    """
+    path = order_file_path(folder)
+    if not os.path.exists(path):
+        return _load_legacy_order(folder)
+    try:
+        with open(path, "r", encoding="utf-8", newline="") as f:
+            lines = f.read().split("\n")
+        # Only the first line is a header; filenames may start with "#" too.
+        if not lines or not lines[0].startswith(ORDER_HEADER):
+            return None
+        return StoredOrder(files=[x for x in lines[1:] if x])
+    except Exception:
+        return None
+
+
 def save_order(folder: str, files: Iterable[str]) -> None:
     path = order_file_path(folder)
-    payload = {
-        "version": 1,
-        "updated_at": datetime.now(timezone.utc).isoformat(),
-        "files": list(files),
-    }
+    header = f"{ORDER_HEADER} {datetime.now(timezone.utc).isoformat()}\n"
     tmp_path = f"{path}.tmp"
-    with open(tmp_path, "w", encoding="utf-8") as f:
-        json.dump(payload, f, indent=2)
-        f.write("\n")
+    # Encode once and write raw bytes; skipping the text layer matters for
+    # very large lists. No fsync: the file can be rebuilt from the folder.
+    with open(tmp_path, "wb", buffering=1 << 20) as f:
+        f.write(header.encode("utf-8"))
+        f.write("\n".join(files).encode("utf-8"))
+        f.write(b"\n")
     os.replace(tmp_path, path)
-
-
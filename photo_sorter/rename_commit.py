@@ -1,9 +1,14 @@
 from __future__ import annotations
 
+import ctypes
 import os
+import sys
+import threading
 import time
 from dataclasses import dataclass
 
+from .constants import THUMB_DIRNAME
+
 
 def sanitize_prefix(prefix: str) -> str:
     prefix = prefix.strip()
@@ -26,62 +31,153 @@ class Collision:
     dst: str
 
 
+class RenameCancelled(Exception):
+    """Raised by execute_rename_plan when cancelled; the folder is left as it was."""
+
+
 def build_rename_plan(folder: str, ordered_files: list[str], prefix: str) -> RenamePlan:
     prefix = sanitize_prefix(prefix)
     pairs: list[tuple[str, str]] = []
+    _sx = os.path.splitext
+    fmt = prefix.replace("%", "%%") + "%05d%s"
+    # Keep extension exactly as-is (case included). This is still "rename only"
+    # without any content/metadata changes.
     for i, old in enumerate(ordered_files):
-        _, ext = os.path.splitext(old)
-        # Keep extension exactly as-is (case included). This is still "rename only"
-        # without any content/metadata changes.
-        new = f"{prefix}{i:05d}{ext}"
-        pairs.append((old, new))
+        pairs.append((old, fmt % (i, _sx(old)[1])))
     return RenamePlan(folder=folder, old_to_new=pairs)
 
 
 def find_collisions(plan: RenamePlan) -> list[Collision]:
     collisions: list[Collision] = []
     existing = set(os.listdir(plan.folder))
+    existing.discard(THUMB_DIRNAME)
+    # Targets that are themselves being renamed away are fine: the two-phase
+    # rename (or an in-place exchange) frees them first. This is what makes
+    # re-committing a reordered folder with the same prefix work.
+    existing.difference_update(old for old, _new in plan.old_to_new)
     for old, new in plan.old_to_new:
-        if new in existing and new != old:
+        if new in existing:
             collisions.append(Collision(src=old, dst=new))
     return collisions
 
 
+_AT_FDCWD = -100
+_RENAME_EXCHANGE = 2
+
+
+def _load_renameat2():
+    """libc renameat2 (Linux, glibc >= 2.28), or None."""
+    if not sys.platform.startswith("linux"):
+        return None
+    try:
+        fn = ctypes.CDLL(None, use_errno=True).renameat2
+    except (OSError, AttributeError):
+        return None
+    fn.argtypes = [ctypes.c_int, ctypes.c_char_p, ctypes.c_int, ctypes.c_char_p, ctypes.c_uint]
+    fn.restype = ctypes.c_int
+    return fn
+
+
+_renameat2 = _load_renameat2()
+
+
+def _exchange(a: str, b: str) -> bool:
+    """Atomically swap two paths in one syscall. False if unsupported/failed."""
+    if _renameat2 is None:
+        return False
+    return _renameat2(_AT_FDCWD, os.fsencode(a), _AT_FDCWD, os.fsencode(b), _RENAME_EXCHANGE) == 0
+
+
 def execute_rename_plan(
     plan: RenamePlan,
     *,
     progress_cb: callable | None = None,
+    cancel_event: threading.Event | None = None,
 ) -> None:
     """
     Two-phase rename:
     1) old -> temp (unique hidden names)
     2) temp -> final
+
+    Pairs that simply trade names (a -> b, b -> a) are swapped in place with
+    renameat2(RENAME_EXCHANGE) where available, skipping the temp phase.
+
+    `cancel_event` is honoured up to the end of phase 1: everything done so far
+    is rolled back and RenameCancelled is raised. Phase 2 always completes.
     """
     folder = plan.folder
+    _rn = os.rename
+    _join = os.path.join
+    total = len(plan.old_to_new) * 2
+    done = 0
+
+    def cancelled() -> bool:
+        return cancel_event is not None and cancel_event.is_set()
+
+    if cancelled():
+        raise RenameCancelled()
+
+    # Phase 0a: swap 2-cycles directly
+    remaining = plan.old_to_new
+    swap_pairs: list[tuple[str, str]] = []
+    if _renameat2 is not None:
+        target_of = dict(plan.old_to_new)
+        swapped: set[str] = set()
+        for old, final in plan.old_to_new:
+            if cancelled():
+                break
+            if old in swapped or old == final or target_of.get(final) != old:
+                continue
+            if _exchange(_join(folder, old), _join(folder, final)):
+                swapped.add(old)
+                swapped.add(final)
+                swap_pairs.append((_join(folder, old), _join(folder, final)))
+                done += 4
+                if progress_cb:
+                    progress_cb(done, total)
+        if swapped:
+            remaining = [(old, final) for old, final in plan.old_to_new if old not in swapped]
+
+    # Phase 0b: compute temp names that don't exist
     ts = int(time.time() * 1000)
-    tmp_pairs: list[tuple[str, str, str]] = []  # (old, tmp, final)
-
-    # Phase 0: compute temp names that don't exist
+    old_paths: list[str] = []
+    tmp_paths: list[str] = []
+    final_paths: list[str] = []
     existing = set(os.listdir(folder))
-    for i, (old, final) in enumerate(plan.old_to_new):
+    for i, (old, final) in enumerate(remaining):
         _, ext = os.path.splitext(final)
         tmp = f".__photo_sorter_tmp__{ts}_{i:05d}{ext}"
         while tmp in existing:
             ts += 1
             tmp = f".__photo_sorter_tmp__{ts}_{i:05d}{ext}"
         existing.add(tmp)
-        tmp_pairs.append((old, tmp, final))
+        old_paths.append(_join(folder, old))
+        tmp_paths.append(_join(folder, tmp))
+        final_paths.append(_join(folder, final))
+
+    def roll_back(moved: int) -> None:
+        for j in range(moved - 1, -1, -1):
+            _rn(tmp_paths[j], old_paths[j])
+        for a, b in reversed(swap_pairs):
+            _exchange(a, b)
+        raise RenameCancelled()
 
     # Phase 1: old -> tmp
-    for idx, (old, tmp, _final) in enumerate(tmp_pairs):
-        os.rename(os.path.join(folder, old), os.path.join(folder, tmp))
+    for idx, (src, tmp) in enumerate(zip(old_paths, tmp_paths)):
+        if cancelled():
+            roll_back(idx)
+        _rn(src, tmp)
+        done += 1
         if progress_cb:
-            progress_cb(idx + 1, len(tmp_pairs) * 2)
+            progress_cb(done, total)
+
+    # Last chance to cancel; past this point files only get their final names.
+    if cancelled():
+        roll_back(len(tmp_paths))
 
     # Phase 2: tmp -> final
-    for idx, (_old, tmp, final) in enumerate(tmp_pairs):
-        os.rename(os.path.join(folder, tmp), os.path.join(folder, final))
+    for tmp, dst in zip(tmp_paths, final_paths):
+        _rn(tmp, dst)
+        done += 1
         if progress_cb:
-            progress_cb(len(tmp_pairs) + idx + 1, len(tmp_pairs) * 2)
-
-
+            progress_cb(done, total)